@@ -2,12 +2,45 @@ from Pieces import Piece, Knight, Blank, Rook, Queen, Pawn, Bishop, King, Color
 import numpy
 import copy
 from enum import IntEnum
+import random
 
 
 class MoveType(IntEnum):
     MOVE_PASSED = 0
     MOVE_FAILED = 1
     CHECKMATE = 2
+    STALEMATE = 3
+    DRAW_REPETITION = 4
+    DRAW_FIFTY_MOVE = 5
+    DRAW_INSUFFICIENT_MATERIAL = 6
+
+
+# messages printed when a move ends the game
+OUTCOME_MESSAGES = {MoveType.CHECKMATE: "Checkmate!", MoveType.STALEMATE: "Stalemate!",
+                    MoveType.DRAW_REPETITION: "Draw by threefold repetition!",
+                    MoveType.DRAW_FIFTY_MOVE: "Draw by the fifty move rule!",
+                    MoveType.DRAW_INSUFFICIENT_MATERIAL: "Draw by insufficient material!"}
+
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# pieces for each FEN letter and the numbers they are usually given in the coordinates list
+FEN_PIECES = {"K": King, "Q": Queen, "R": Rook, "B": Bishop, "N": Knight, "P": Pawn}
+FEN_SLOTS = {"K": [4], "Q": [3], "R": [0, 7], "B": [2, 5], "N": [1, 6], "P": list(range(8, 16))}
+PROMOTION_PIECES = {"q": Queen, "r": Rook, "b": Bishop, "n": Knight}
+
+# random keys used to hash positions, the seed is fixed so a position hashes the same way in every run
+zobrist_random = random.Random(2020)
+ZOBRIST_KINDS = {Pawn: 0, Knight: 1, Bishop: 2, Rook: 3, Queen: 4, King: 5}
+ZOBRIST_PIECES = [[[zobrist_random.getrandbits(64) for square in range(64)] for kind in range(6)] for color in range(2)]
+ZOBRIST_CASTLING = [zobrist_random.getrandbits(64) for right in range(4)]
+ZOBRIST_BLACK_TO_MOVE = zobrist_random.getrandbits(64)
+
+# directions pieces move in as [row change, col change]
+ROOK_DIRECTIONS = [[1, 0], [-1, 0], [0, 1], [0, -1]]
+BISHOP_DIRECTIONS = [[1, 1], [1, -1], [-1, 1], [-1, -1]]
+KING_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+KNIGHT_JUMPS = [[1, 2], [2, 1], [2, -1], [1, -2], [-1, -2], [-2, -1], [-2, 1], [-1, 2]]
 
 
 # The three functions below are helper functions for the init_board method in the ChessBoard class
@@ -36,15 +69,82 @@ class ChessBoard:
 
     def __init__(self):
         self.board = []
+        self.turn = Color.WHITE  # color of the player who moves next
+        self.hash = 0  # zobrist hash of the position
+        self.halfmove_clock = 0  # moves since the last capture or pawn move, used for the fifty move rule
+        self.history = []  # stack of hashes of the positions since the last capture or pawn move
+        self.repetitions = {}  # maps each hash in history to how many times it appears
+        self.legal_cache = {}  # maps color to its list of legal moves in the current position
+        self.last_move = None  # last move made in the form [r1, c1, r2, c2]
         self.init_board()
         self.coord = []
         self.init_coord()
 
+    def __deepcopy__(self, memo):
+        """
+        copies the board for the CPU search much faster than the generic deepcopy
+        pieces only hold simple values so each one is copied shallowly, blank squares are never changed so they are
+        shared, and move lists in legal_cache are never changed once made so they are shared too
+        """
+        new_board = ChessBoard.__new__(ChessBoard)
+        new_board.__dict__.update(self.__dict__)
+        new_board.board = [[piece if piece.piece_color == Color.BLANK else copy.copy(piece) for piece in row]
+                           for row in self.board]
+        new_board.coord = [[list(square) for square in color_coord] for color_coord in self.coord]
+        new_board.history = list(self.history)
+        new_board.repetitions = dict(self.repetitions)
+        new_board.legal_cache = dict(self.legal_cache)
+        return new_board
+
     def init_board(self):
         self.board = [first_row(Color.WHITE), pawns(Color.WHITE)]
         for i in range(4):
             self.board.append(blank_row())
         self.board += [pawns(Color.BLACK), first_row(Color.BLACK)]
+        self.reset_history(Color.WHITE)
+
+    def reset_history(self, turn: Color, halfmove_clock: int = 0):
+        """
+        starts the repetition history and halfmove clock over from the current position
+        :param turn: color of the player who moves next
+        :param halfmove_clock: moves since the last capture or pawn move
+        :return: void
+        """
+        self.turn = turn
+        self.halfmove_clock = halfmove_clock
+        self.legal_cache = {}
+        self.hash = self.compute_hash()
+        self.history = [self.hash]
+        self.repetitions = {self.hash: 1}
+
+    def compute_hash(self) -> int:
+        """
+        computes the zobrist hash of the position from the pieces, castling rights and player to move
+        :return: 64 bit hash of the position
+        """
+        h = ZOBRIST_BLACK_TO_MOVE if self.turn == Color.BLACK else 0
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece.piece_color != Color.BLANK:
+                    h ^= ZOBRIST_PIECES[piece.piece_color][ZOBRIST_KINDS[type(piece)]][8 * r + c]
+        for i, right in enumerate(self.castling_rights()):
+            if right:
+                h ^= ZOBRIST_CASTLING[i]
+        return h
+
+    def castling_rights(self) -> list:
+        """
+        a castling right exists while the king and the rook are both unmoved in their corners
+        :return: list of 4 booleans for white queen side, white king side, black queen side, black king side
+        """
+        rights = []
+        for r, c in [[0, 0], [0, 7], [7, 0], [7, 7]]:
+            king = self.board[r][4]
+            rook = self.board[r][c]
+            rights.append(isinstance(king, King) and not king.has_moved and isinstance(rook, Rook) and
+                          not rook.has_moved)
+        return rights
 
     def init_coord(self):
         white_coord = []
@@ -127,7 +227,8 @@ class ChessBoard:
         else:
             return True
 
-    def move_piece(self, r1: int, c1: int, r2: int, c2: int, color: str = "blank") -> MoveType:
+    def move_piece(self, r1: int, c1: int, r2: int, c2: int, color: str = "blank",
+                   check_outcome: bool = True, promotion: type = Queen) -> MoveType:
         """
         method that moves the piece on the board
         :param color: string of the color of the piece being moved
@@ -135,58 +236,391 @@ class ChessBoard:
         :param c1: start col
         :param r2: dest row
         :param c2: dest col
-        :return: enumeration of move type to determine if move passed/failed or if there was checkmate
+        :param check_outcome: whether to look for checkmate, stalemate and draws after the move, the CPU search
+        turns this off because it works out the outcome itself
+        :param promotion: class of the piece a pawn reaching the last row is promoted to
+        :return: enumeration of move type to determine if move passed/failed or if the game is over
         """
 
-        is_capture = self.board[r2][c2].piece_color != Color.BLANK
-        oppo_col = self.board[r1][c1].opp_color()
+        moved = self.board[r1][c1]
+        # only moves in the list of legal moves are made, that list already accounts for pins and checks so
+        # a move never has to be made, tested and taken back
+        if moved.piece_color == Color.BLANK or [r1, c1, r2, c2] not in self.legal_moves(moved.piece_color):
+            if color != "blank":
+                print("Can't make that move, your King is in check")
+            return MoveType.MOVE_FAILED
+
+        oppo_col = moved.opp_color()
+        self.make_move(r1, c1, r2, c2, promotion)
+
+        if not check_outcome:
+            return MoveType.MOVE_PASSED
+
+        move_type = self.get_outcome(oppo_col)
+        if color != "blank":
+            if move_type != MoveType.MOVE_PASSED:
+                print(OUTCOME_MESSAGES[move_type])
+            elif self.is_check(oppo_col):
+                print("{} King is in check".format(color))
+        return move_type
+
+    def make_move(self, r1: int, c1: int, r2: int, c2: int, promotion: type = Queen):
+        """
+        moves the piece on the board without checking the move, callers make sure it is legal
+        handles captures, promotion and moving the rook when the King castles
+        :param r1: start row
+        :param c1: start col
+        :param r2: dest row
+        :param c2: dest col
+        :param promotion: class of the piece a pawn reaching the last row is promoted to
+        :return: void
+        """
+        moved = self.board[r1][c1]
+        captured = self.board[r2][c2]
+        is_capture = captured.piece_color != Color.BLANK
+        rights_before = self.castling_rights()
+
+        # the hash is updated by taking out the keys of pieces that leave a square and putting in the keys of
+        # pieces that arrive, instead of hashing the whole board again
+        self.hash ^= piece_key(moved, r1, c1) ^ ZOBRIST_BLACK_TO_MOVE
+        if is_capture:
+            self.hash ^= piece_key(captured, r2, c2)
 
         # move piece to desired location on the board
-        temp = self.board[r2][c2]
-        self.board[r2][c2] = self.board[r1][c1]
+        self.board[r2][c2] = moved
         self.board[r1][c1] = Blank()
+        self.update_coord([r2, c2], moved.piece_color)
+        if is_capture:
+            self.coord[captured.piece_color][captured.number] = [-1, -1]
 
-        self.update_coord([r2, c2], self.board[r2][c2].piece_color)  # make initial update for piece coordinates
-
-        # This code handles moving the rook if king tried to castle
-        if isinstance(self.board[r2][c2], King) and self.board[r2][c2].can_castle:
-            row_diff = r2 - r1
-            col_diff = c2 - c1
-            piece_color = self.board[r2][c2].piece_color
-            # get the signs of the change of direction between start and end coord
-            signs = numpy.sign([row_diff, col_diff])
+        # a pawn that reaches the last row is promoted, to a Queen unless another piece was chosen
+        if isinstance(moved, Pawn) and r2 in (0, 7):
+            self.board[r2][c2] = promotion(moved.piece_color, moved.number)
 
-            rook_coord = self.coord[piece_color][0] if signs[1] == -1 else self.coord[piece_color][7]
-            self.board[r2][c2 - signs[1]] = self.board[rook_coord[0]][rook_coord[1]]
+        # This code handles moving the rook if king castled
+        if isinstance(moved, King) and abs(c2 - c1) == 2:
+            direct = 1 if c2 > c1 else -1
+            rook_coord = self.coord[moved.piece_color][0] if direct == -1 else self.coord[moved.piece_color][7]
+            self.board[r2][c2 - direct] = self.board[rook_coord[0]][rook_coord[1]]
             self.board[rook_coord[0]][rook_coord[1]] = Blank()
+            self.update_coord([r2, c2 - direct], moved.piece_color)
+            self.board[r2][c2 - direct].piece_moved()
+            moved.can_castle = False
+            self.hash ^= piece_key(self.board[r2][c2 - direct], rook_coord[0], rook_coord[1]) ^ \
+                piece_key(self.board[r2][c2 - direct], r2, c2 - direct)
 
-            self.update_coord([r2, c2 - signs[1]], piece_color)  # make initial update for piece coordinates
+        self.board[r2][c2].piece_moved()  # indicate piece has moved
+        self.hash ^= piece_key(self.board[r2][c2], r2, c2)
+        for i, (before, after) in enumerate(zip(rights_before, self.castling_rights())):
+            if before != after:
+                self.hash ^= ZOBRIST_CASTLING[i]
+        self.last_move = [r1, c1, r2, c2]
+        self.turn = moved.opp_color()
+        self.legal_cache = {}
+        self.record_position(isinstance(moved, Pawn) or is_capture)
+
+    def record_position(self, irreversible: bool):
+        """
+        adds the position to the repetition history after a move has been made
+        :param irreversible: whether the move was a capture or pawn move, positions before one can never repeat
+        :return: void
+        """
+        if irreversible:
+            self.halfmove_clock = 0
+            self.history = []
+            self.repetitions = {}
+        else:
+            self.halfmove_clock += 1
+        self.history.append(self.hash)
+        self.repetitions[self.hash] = self.repetitions.get(self.hash, 0) + 1
 
-        # if moved caused your king to be in check then pieces are put back to where they were before and
-        # player will be asked to make a different move
-        if self.is_check(self.board[r2][c2].piece_color):
-            self.board[r1][c1] = self.board[r2][c2]  # put original piece back where it was
-            self.board[r2][c2] = temp  # set destination square to piece that was there before
-            self.update_coord([r1, c1], self.board[r1][c1].piece_color)
-            if color != "blank":
-                print("Can't make that move, your King is in check")
-            return MoveType.MOVE_FAILED
+    def get_outcome(self, color: Color) -> MoveType:
+        """
+        works out whether the game is over now that it is the turn of the color passed in
+        :param color: color of the player whose turn it is
+        :return: the way the game ended or MOVE_PASSED if it goes on
+        """
+        if len(self.legal_moves(color)) == 0:
+            return MoveType.CHECKMATE if self.is_check(color) else MoveType.STALEMATE
+        if self.repetitions[self.hash] >= 3:
+            return MoveType.DRAW_REPETITION
+        if self.halfmove_clock >= 100:
+            return MoveType.DRAW_FIFTY_MOVE
+        if self.is_insufficient_material():
+            return MoveType.DRAW_INSUFFICIENT_MATERIAL
+        return MoveType.MOVE_PASSED
 
-        # check if player move caused opponent to be in check
-        if self.is_check(oppo_col):
-            if self.is_checkmate(oppo_col):
-                print("Checkmate!")
-                return MoveType.CHECKMATE
-            else:
-                print("{} King is in check".format(color))
+    def is_draw(self, repeats: int = 3) -> bool:
+        """
+        checks the draw rules that don't need the list of legal moves
+        :param repeats: number of times the position has to have appeared to count as a repetition, the search
+        uses 2 so it stops looking at lines that go round in circles
+        :return: boolean stating whether the position is a draw
+        """
+        return self.repetitions.get(self.hash, 0) >= repeats or self.halfmove_clock >= 100 or \
+            self.is_insufficient_material()
 
-        # update coordinates for piece that is captured if move is completed
-        if is_capture:
-            self.coord[temp.piece_color][temp.number] = [-1, -1]
+    def is_insufficient_material(self) -> bool:
+        """
+        checks if neither player has enough pieces left to checkmate: king against king and at most one knight or
+        bishop, or only bishops that are all on squares of the same color
+        :return: boolean stating whether there is insufficient material
+        """
+        minor_pieces = []
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if isinstance(piece, (Pawn, Rook, Queen)):
+                    return False
+                if isinstance(piece, (Knight, Bishop)):
+                    minor_pieces.append([piece, (r + c) % 2])
+        if len(minor_pieces) <= 1:
+            return True
+        return all(isinstance(piece, Bishop) and shade == minor_pieces[0][1] for piece, shade in minor_pieces)
 
-        self.board[r2][c2].piece_moved()  # indicate piece has moved
+    def attacked(self, r: int, c: int, by_color: Color, ignore: list = None) -> bool:
+        """
+        checks if a square is attacked by any piece of the color passed in
+        :param r: row of square
+        :param c: col of square
+        :param by_color: color of the attacking pieces
+        :param ignore: optional square treated as empty, used for the square a King is moving away from
+        :return: boolean stating whether the square is attacked
+        """
+        # pawns attack diagonally forward so an attacking pawn is diagonally behind the square
+        pawn_row = r - 1 if by_color == Color.WHITE else r + 1
+        if 0 <= pawn_row <= 7:
+            for pawn_col in (c - 1, c + 1):
+                piece = self.board[pawn_row][pawn_col] if 0 <= pawn_col <= 7 else None
+                if isinstance(piece, Pawn) and piece.piece_color == by_color:
+                    return True
 
-        return MoveType.MOVE_PASSED
+        for jumps, piece_type in [[KNIGHT_JUMPS, Knight], [KING_DIRECTIONS, King]]:
+            for dr, dc in jumps:
+                if 0 <= r + dr <= 7 and 0 <= c + dc <= 7:
+                    piece = self.board[r + dr][c + dc]
+                    if isinstance(piece, piece_type) and piece.piece_color == by_color:
+                        return True
+
+        for directions, piece_types in [[ROOK_DIRECTIONS, (Rook, Queen)], [BISHOP_DIRECTIONS, (Bishop, Queen)]]:
+            for dr, dc in directions:
+                temp_r, temp_c = r + dr, c + dc
+                while 0 <= temp_r <= 7 and 0 <= temp_c <= 7:
+                    piece = self.board[temp_r][temp_c]
+                    if piece.piece_color != Color.BLANK and [temp_r, temp_c] != ignore:
+                        if isinstance(piece, piece_types) and piece.piece_color == by_color:
+                            return True
+                        break
+                    temp_r += dr
+                    temp_c += dc
+        return False
+
+    def pins_and_checkers(self, color: Color) -> tuple:
+        """
+        finds the pieces giving check to the King of the color passed in and the pieces pinned to it
+        :param color: color of King
+        :return: tuple of (list of checker coordinates, set of squares that stop a single check by capturing or
+        blocking, dict mapping each pinned piece's coordinates to the direction it is pinned along)
+        """
+        king_r, king_c = self.coord[color][4]
+        oppo_col = Color(1 - color)
+        checkers = []
+        evasions = set()
+        pins = {}
+
+        # walk out from the King in every direction looking for enemy sliders with at most one of our pieces between
+        for directions, piece_types in [[ROOK_DIRECTIONS, (Rook, Queen)], [BISHOP_DIRECTIONS, (Bishop, Queen)]]:
+            for dr, dc in directions:
+                path = []
+                blocker = None
+                temp_r, temp_c = king_r + dr, king_c + dc
+                while 0 <= temp_r <= 7 and 0 <= temp_c <= 7:
+                    piece = self.board[temp_r][temp_c]
+                    path.append((temp_r, temp_c))
+                    if piece.piece_color == color:
+                        if blocker is not None:
+                            break
+                        blocker = (temp_r, temp_c)
+                    elif piece.piece_color == oppo_col:
+                        if isinstance(piece, piece_types):
+                            if blocker is None:
+                                checkers.append([temp_r, temp_c])
+                                evasions.update(path)
+                            else:
+                                pins[blocker] = (dr, dc)
+                        break
+                    temp_r += dr
+                    temp_c += dc
+
+        # knights and pawns can't be blocked so the only way to stop their check is to capture them
+        pawn_row = king_r + 1 if color == Color.WHITE else king_r - 1
+        for jumps, piece_type in [[KNIGHT_JUMPS, Knight], [[[pawn_row - king_r, -1], [pawn_row - king_r, 1]], Pawn]]:
+            for dr, dc in jumps:
+                if 0 <= king_r + dr <= 7 and 0 <= king_c + dc <= 7:
+                    piece = self.board[king_r + dr][king_c + dc]
+                    if isinstance(piece, piece_type) and piece.piece_color == oppo_col:
+                        checkers.append([king_r + dr, king_c + dc])
+                        evasions.add((king_r + dr, king_c + dc))
+
+        return checkers, evasions, pins
+
+    def legal_moves(self, color: Color) -> list:
+        """
+        creates the list of legal moves for the color passed in, pins and checks are worked out once for the
+        position so only moves that keep the King safe are generated, the list is kept until the next move
+        :param color: color of player
+        :return: list of moves in the form [r1, c1, r2, c2] with captures listed first
+        """
+        if color in self.legal_cache:
+            return self.legal_cache[color]
+
+        captures = []
+        quiet = []
+        king_r, king_c = self.coord[color][4]
+        oppo_col = Color(1 - color)
+        checkers, evasions, pins = self.pins_and_checkers(color)
+
+        # the King can go to any square that isn't attacked once it has left its current square
+        for dr, dc in KING_DIRECTIONS:
+            r, c = king_r + dr, king_c + dc
+            if 0 <= r <= 7 and 0 <= c <= 7 and self.board[r][c].piece_color != color and \
+                    not self.attacked(r, c, oppo_col, [king_r, king_c]):
+                (quiet if self.board[r][c].piece_color == Color.BLANK else captures).append([king_r, king_c, r, c])
+        for direct in (-1, 1):
+            if 0 <= king_c + 2 * direct <= 7 and \
+                    castle_possible(self, king_r, king_c, king_r, king_c + 2 * direct, direct, color):
+                quiet.append([king_r, king_c, king_r, king_c + 2 * direct])
+
+        # in double check only the King can move
+        if len(checkers) < 2:
+            for number, piece_coord in enumerate(self.coord[color]):
+                if number == 4 or piece_coord[0] == -1:
+                    continue
+                r1, c1 = piece_coord
+                pin = pins.get((r1, c1))
+                for r2, c2 in self.piece_targets(r1, c1):
+                    # a pinned piece can only move along the line between its King and the pinning piece
+                    if pin is not None and (r2 - king_r) * pin[1] != (c2 - king_c) * pin[0]:
+                        continue
+                    # in check a piece has to capture the checker or block the check
+                    if len(checkers) == 1 and (r2, c2) not in evasions:
+                        continue
+                    (quiet if self.board[r2][c2].piece_color == Color.BLANK else captures).append([r1, c1, r2, c2])
+
+        self.legal_cache[color] = captures + quiet
+        return self.legal_cache[color]
+
+    def piece_targets(self, r: int, c: int) -> list:
+        """
+        lists the squares the piece on the square passed in can move to ignoring whether its King is left in
+        check, the same rules as is_valid_move for every piece but the King
+        :param r: row of piece
+        :param c: col of piece
+        :return: list of (row, col) destinations
+        """
+        piece = self.board[r][c]
+        color = piece.piece_color
+        targets = []
+        if isinstance(piece, Pawn):
+            direct = 1 if color == Color.WHITE else -1
+            if 0 <= r + direct <= 7:
+                if self.board[r + direct][c].piece_color == Color.BLANK:
+                    targets.append((r + direct, c))
+                    if not piece.has_moved and 0 <= r + 2 * direct <= 7 and \
+                            self.board[r + 2 * direct][c].piece_color == Color.BLANK:
+                        targets.append((r + 2 * direct, c))
+                for temp_c in (c - 1, c + 1):
+                    if 0 <= temp_c <= 7 and self.board[r + direct][temp_c].piece_color == piece.opp_color():
+                        targets.append((r + direct, temp_c))
+        elif isinstance(piece, Knight):
+            for dr, dc in KNIGHT_JUMPS:
+                if 0 <= r + dr <= 7 and 0 <= c + dc <= 7 and self.board[r + dr][c + dc].piece_color != color:
+                    targets.append((r + dr, c + dc))
+        else:
+            directions = ROOK_DIRECTIONS if isinstance(piece, Rook) else \
+                BISHOP_DIRECTIONS if isinstance(piece, Bishop) else KING_DIRECTIONS
+            for dr, dc in directions:
+                temp_r, temp_c = r + dr, c + dc
+                while 0 <= temp_r <= 7 and 0 <= temp_c <= 7 and self.board[temp_r][temp_c].piece_color != color:
+                    targets.append((temp_r, temp_c))
+                    if self.board[temp_r][temp_c].piece_color != Color.BLANK:
+                        break
+                    temp_r += dr
+                    temp_c += dc
+        return targets
+
+    def load_fen(self, fen: str) -> Color:
+        """
+        sets up the board from a FEN string
+        piece numbers are handed out so that the King is always 4 and the castling rooks are 0 and 7
+        :param fen: FEN string, only the placement, side to move and castling fields are used
+        :return: color of the player whose turn it is
+        """
+        fields = fen.split()
+        castling = fields[2] if len(fields) > 2 else "-"
+        self.board = [blank_row() for i in range(8)]
+        self.coord = [[[-1, -1] for i in range(16)], [[-1, -1] for i in range(16)]]
+
+        # collect every piece on the board along with its square
+        found = []
+        for i, rank in enumerate(fields[0].split("/")):
+            r, c = 7 - i, 0
+            for char in rank:
+                if char.isdigit():
+                    c += int(char)
+                else:
+                    color = Color.WHITE if char.isupper() else Color.BLACK
+                    found.append([char.upper(), color, r, c])
+                    c += 1
+
+        # give pieces their usual numbers first then fill in any leftover pieces (promotions) in free slots
+        leftovers = []
+        for char, color, r, c in found:
+            home = 0 if color == Color.WHITE else 7
+            slots = FEN_SLOTS[char]
+            if char == "R":  # only rooks in the corners can take the castling slots
+                slots = [0] if (r, c) == (home, 0) else [7] if (r, c) == (home, 7) else []
+            for slot in slots:
+                if self.coord[color][slot] == [-1, -1]:
+                    self.place_fen_piece(char, color, slot, r, c)
+                    break
+            else:
+                leftovers.append([char, color, r, c])
+        for char, color, r, c in leftovers:
+            slot = self.coord[color].index([-1, -1])
+            self.place_fen_piece(char, color, slot, r, c)
+
+        # pieces that can no longer castle or pawns off their starting row count as having moved
+        for color, king_side, queen_side in [[Color.WHITE, "K", "Q"], [Color.BLACK, "k", "q"]]:
+            for slot, right in [[0, queen_side], [7, king_side]]:
+                rook_coord = self.coord[color][slot]
+                if rook_coord != [-1, -1] and right not in castling:
+                    self.board[rook_coord[0]][rook_coord[1]].piece_moved()
+            king_coord = self.coord[color][4]
+            if king_coord != [-1, -1] and king_side not in castling and queen_side not in castling:
+                self.board[king_coord[0]][king_coord[1]].piece_moved()
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if isinstance(piece, Pawn) and r != (1 if piece.piece_color == Color.WHITE else 6):
+                    piece.piece_moved()
+
+        turn = Color.BLACK if len(fields) > 1 and fields[1] == "b" else Color.WHITE
+        self.reset_history(turn, int(fields[4]) if len(fields) > 4 else 0)
+        return turn
+
+    def place_fen_piece(self, char: str, color: Color, slot: int, r: int, c: int):
+        """
+        helper for load_fen that puts a piece on the board and records its coordinates
+        :param char: upper case FEN letter of the piece
+        :param color: color of the piece
+        :param slot: number the piece is given in the coordinates list
+        :param r: row of the piece
+        :param c: col of the piece
+        :return: void
+        """
+        self.board[r][c] = FEN_PIECES[char](color, slot)
+        self.coord[color][slot] = [r, c]
 
     def update_coord(self, dest: list, color: Color):
         """
@@ -204,33 +638,25 @@ class ChessBoard:
         :return: boolean stating whether the king is in check (True) or not (False)
         """
         king_coord = self.coord[color][4]
-        oppo_col = self.board[int(king_coord[0])][int(king_coord[1])].opp_color()
-
-        for i in range(16):
-            temp_coord = self.coord[oppo_col][i]
-            if temp_coord[0] == -1 and temp_coord[1] == -1:
-                continue
-            if self.is_valid_move(temp_coord[0], temp_coord[1], king_coord[0], king_coord[1], oppo_col):
-                return True
-        else:
-            return False
+        return self.attacked(king_coord[0], king_coord[1], Color(1 - color))
 
     def is_checkmate(self, color: Color) -> bool:
-        king_moves = get_king_moves(self, color)  # get a list of possible moves the king can make
-        attackers = get_attackers(self, color)  # get a list of the coordinates of any attackers to the king
-        
-        # run this code only if there is exactly 1 attacker
-        if len(attackers) == 1:
-            # return false if the attacker can be captured proving king is not in checkmate
-            if capture_or_block_attacker(self, color, attackers[0]):
-                return False
-        # if attackers cannot be captured or blocked and the King has no moves then return True
-        if len(king_moves) == 0:
-            return True
+        return self.is_check(color) and len(self.legal_moves(color)) == 0
 
 
 # ======================================================================#
 
+def piece_key(piece: Piece, r: int, c: int) -> int:
+    """
+    gets the zobrist key of a piece standing on a square
+    :param piece: piece, not a blank
+    :param r: row of square
+    :param c: col of square
+    :return: 64 bit key
+    """
+    return ZOBRIST_PIECES[piece.piece_color][ZOBRIST_KINDS[type(piece)]][8 * r + c]
+
+
 def castle_possible(b1: ChessBoard, r1: int, c1: int, r2: int, c2: int, direct: int, color: Color) -> bool:
     """
     this function will determine if King can castle
@@ -243,102 +669,60 @@ def castle_possible(b1: ChessBoard, r1: int, c1: int, r2: int, c2: int, direct:
     :param color: color of king
     :return: boolean stating whether castling is possible
     """
-    if b1.is_check(color):
+    if b1.board[r1][c1].has_moved or b1.is_check(color):
         return False
     rook_coord = b1.coord[color][0] if direct == -1 else b1.coord[color][7]
-    if b1.board[rook_coord[0]][rook_coord[1]].has_moved:  # if rook has moved then return false
+    if rook_coord == [-1, -1] or rook_coord[0] != r1:  # if rook has been captured then return false
         return False
-    if not b1.is_valid_move(rook_coord[0], rook_coord[1], r2, c2 - direct, color):
+    rook = b1.board[rook_coord[0]][rook_coord[1]]
+    if not isinstance(rook, Rook) or rook.piece_color != color or rook.has_moved:  # if rook has moved return false
         return False
 
+    # return false if there are any pieces between the King and the rook
     temp = c1
-    temp_board = copy.deepcopy(b1)
-    # return false if pieces of different color are in the way
     for i in range(abs(rook_coord[1] - c1) - 1):
         temp += direct
-        if temp_board.board[r1][temp].piece_color != Color.BLANK:
+        if b1.board[r1][temp].piece_color != Color.BLANK:
+            return False
+    # return false if the King would pass through or land on an attacked square
+    for temp in (c1 + direct, c2):
+        if b1.attacked(r2, temp, Color(1 - color)):
             return False
-    # return false if there were pieces of the same color in the way
-    if temp_board.move_piece(r1, c1, r2, c2) != MoveType.MOVE_PASSED:
-        return False
-    del temp_board
 
     # all conditions for castling have been met so return true
     return True
 
 
-def get_king_moves(board1: ChessBoard, color: Color) -> list:  # add -> list
+def get_all_moves(board1: ChessBoard, color: Color) -> list:
     """
-    This function creates and returns a list of moves that the king of the color passed in can make
+    creates a list of every legal move the pieces of the color passed in can make
     :param board1: chess board
-    :param color: color of king whose moves are being checked for
-    :return: a list of coordinates for the king to potentially move to
+    :param color: color of player whose moves are being generated
+    :return: new list of moves in the form [r1, c1, r2, c2] with captures listed first
     """
-    king_coord = board1.coord[color][4]
-    move_list = []
-    for r in range(-1, 2):
-        if (king_coord[0] + r) < 0 or (king_coord[0] + r) > 7:
-            continue
-        for c in range(-1, 2):
-            if r == 0 and c == 0:
-                continue
-            if (king_coord[1] + c) < 0 or (king_coord[1] + c) > 7:
-                continue
-            temp1, temp2, temp3, temp4 = king_coord[0], king_coord[1], king_coord[0] + r, king_coord[1] + c
-            if board1.is_valid_move(temp1, temp2, temp3, temp4, color):
-                temp_board = copy.deepcopy(board1)  # have temp board be a copy of the board passed in
-                move_type = temp_board.move_piece(temp1, temp2, temp3, temp4)
-                if move_type == MoveType.MOVE_PASSED:
-                    move_list.append(temp_board.coord[color][4])
-                del temp_board
-
-    return move_list
-
-
-def get_attackers(board1: ChessBoard, color: Color) -> list:
-    """
-    gets a list of attackers to the king of the color passed
-    :param board1: chess board
-    :param color: color of king that has potential attackers
-    :return: list of coordinates for the attackers
-    """
-    king_coord = board1.coord[color][4]
-    oppo_color: Color = 1 - color
-    # traverse opposite color pieces and find any attacking the king of the passed in color
-    return [piece for piece in board1.coord[oppo_color] if
-            board1.is_valid_move(piece[0], piece[1], king_coord[0], king_coord[1], oppo_color)]
+    return list(board1.legal_moves(color))
 
 
-def capture_or_block_attacker(board1: ChessBoard, color: Color, attacker: list) -> bool:
+def move_to_string(move: list) -> str:
     """
-    This function determines if any piece of the color in check can capture the attacker
-    :param board1: chess board
-    :param color: color of player in check
-    :param attacker: list that contains the coordinates of the attacker
-    :return: boolean stating whether attacker can be captured (True) or not (False)
+    converts a move in the form [r1, c1, r2, c2] to a string such as e2e4
+    :param move: list of start and destination coordinates
+    :return: move in coordinate notation
     """
-    king_coord = board1.coord[color][4]
-    for piece in board1.coord[color]:
-        temp1, temp2, temp3, temp4 = king_coord[0], king_coord[1], attacker[0], attacker[1]
-        row_diff = temp3 - temp1
-        col_diff = temp4 - temp2
+    return "{}{}{}{}".format(chr(ord("a") + int(move[1])), int(move[0]) + 1,
+                             chr(ord("a") + int(move[3])), int(move[2]) + 1)
 
-        # get the signs of the change of direction between start and end coord
-        signs = numpy.sign([row_diff, col_diff])
 
-        # traverse the board starting at the current piece and check for any spots in the path that are not blank
-        # if spot is not blank then return false saying the move was illegal
-        for i in range(max(abs(row_diff), abs(col_diff))):
-            temp1 += signs[0]
-            temp2 += signs[1]
-            if board1.is_valid_move(piece[0], piece[1], temp1, temp2, color):
-                temp_board = copy.deepcopy(board1)  # have temp board be a copy of the board passed in
-                move_type = temp_board.move_piece(piece[0], piece[1], temp1, temp2)
-                if move_type == MoveType.MOVE_PASSED:
-                    return True
-                del temp_board
-    return False
+def string_to_move(move_string: str) -> list:
+    """
+    converts a string such as e2e4 to a move in the form [r1, c1, r2, c2]
+    :param move_string: move in coordinate notation, anything after the first 4 characters is ignored
+    :return: list of start and destination coordinates
+    """
+    return [ord(move_string[1]) - ord("1"), ord(move_string[0]) - ord("a"),
+            ord(move_string[3]) - ord("1"), ord(move_string[2]) - ord("a")]
 
 
-b = ChessBoard()
-b.display_board()
+if __name__ == "__main__":
+    b = ChessBoard()
+    b.display_board()
@@ -1,8 +1,23 @@
 # This module will include the abstract class Player and the two derived Classes HumanPlayer and CPUPlayer
 from abc import ABC, abstractmethod
-from ChessBoard import ChessBoard, MoveType
-from Pieces import Color
+from ChessBoard import ChessBoard, MoveType, get_all_moves, move_to_string, string_to_move
+from Pieces import Color, Pawn, Knight, Bishop, Rook, Queen, King
+import copy
 import re
+import threading
+import time
+
+# values used by the CPU to weigh up the material on the board
+PIECE_VALUES = {Pawn: 100, Knight: 320, Bishop: 330, Rook: 500, Queen: 900, King: 0}
+MATE_SCORE = 100000
+MAX_DEPTH = 64
+
+# kinds of score kept in the transposition table
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+TT_SIZE = 1000000  # the table goes back to the entries loaded from the cache once it holds this many positions
+CACHE_LOAD_SIZE = TT_SIZE // 2  # most positions loaded from the cache at startup, the deepest are loaded first
 
 
 class Player(ABC):
@@ -11,6 +26,7 @@ class Player(ABC):
     def __init__(self, color: Color):
         self.player_score = 0
         self.player_color = color
+        self.last_score = None  # score the player gave its last move, None if it doesn't score moves
 
     def reset_game(self):
         self.player_score = 0
@@ -64,13 +80,13 @@ class HumanPlayer(Player):
                 diff.append(resp_i - origin_i)
 
             if board.is_valid_move(diff[1], diff[0], diff[3], diff[2], self.player_color):
-                # Have the board make the move and return True if checkmate was a achieved and false if it wasn't
-                # if move failed then loop is continued and nothing is returned
+                # Have the board make the move and return True if the game is over (checkmate or a draw) and
+                # false if it isn't, if move failed then loop is continued and nothing is returned
                 move_type = board.move_piece(diff[1], diff[0], diff[3], diff[2], self.color_to_string(True))
-                if move_type == MoveType.CHECKMATE:
-                    return True
-                elif move_type == MoveType.MOVE_PASSED:
+                if move_type == MoveType.MOVE_PASSED:
                     return False
+                elif move_type != MoveType.MOVE_FAILED:
+                    return True
             else:
                 print("Error invalid move. Please try again!")
 
@@ -88,12 +104,316 @@ class HumanPlayer(Player):
 # ==============================================================================#
 
 
+class SearchStopped(Exception):
+    """raised inside the search when it has been told to stop or has run out of time"""
+    pass
+
+
 class CPUPlayer(Player):
 
     # constructor
-    def __init__(self, color: Color):
+    def __init__(self, color: Color, depth: int = 2, cache=None, ponder: bool = False):
         super(CPUPlayer, self).__init__(color)
+        self.depth = depth  # how many moves ahead the CPU looks
+        self.nodes = 0  # number of positions looked at in the current search
+        self.best_score = None  # score of the best move found by the last search
+        self.deadline = None  # time the current search has to finish by
+        self.earlier_hashes = set()  # positions played before the root of the current search
+        self.history_draw = False  # whether the current search scored a repetition of an earlier position as a draw
+        self.stop_event = threading.Event()  # set from another thread to end a search early
+        self.tt = {}  # transposition table mapping position hash to (depth, score, kind of score, best move)
+        self.cache_tt = {}  # entries loaded from the cache, kept when the transposition table is emptied
+        self.cache = cache  # optional AnalysisCache that search results are saved to
+        self.ponder = ponder  # whether to keep searching on the opponent's turn
+        self.ponder_thread = None
+        if cache is not None:
+            self.load_cache()
+
+    def load_cache(self):
+        """
+        fills the transposition table with the deepest analyses saved in the cache, positions that don't fit are
+        still found by looking them up in the cache when they are searched
+        :return: void
+        """
+        self.cache_tt = {}
+        for h, best_move, score, depth, nodes in self.cache.entries(CACHE_LOAD_SIZE):
+            self.cache_tt[h] = (depth, score, EXACT, string_to_move(best_move))
+        for h, entry in self.cache_tt.items():
+            if h not in self.tt or self.tt[h][0] < entry[0]:
+                self.tt[h] = entry
 
     # Override
-    def move(self, board: ChessBoard):
-        x = 0
+    def move(self, board: ChessBoard) -> bool:
+        # whatever was worked out while pondering on the move that was actually played is in the transposition
+        # table so the search below picks up where pondering left off
+        self.stop_pondering()
+        self.stop_event.clear()
+        best_move = self.search(board, self.depth)
+        self.last_score = self.best_score
+        if best_move is None:  # no legal moves left so the game is over
+            return True
+        print("{} moves {}".format(self.color_to_string(), move_to_string(best_move)))
+        move_type = board.move_piece(best_move[0], best_move[1], best_move[2], best_move[3],
+                                     self.color_to_string(True))
+        if move_type != MoveType.MOVE_PASSED:
+            return True
+        if self.ponder:
+            self.start_pondering(board)
+        return False
+
+    def start_pondering(self, board: ChessBoard):
+        """
+        starts searching the replies the opponent could make on a background thread
+        :param board: chess board after the CPU's move, the thread works on its own copy
+        :return: void
+        """
+        self.stop_event.clear()
+        self.ponder_thread = threading.Thread(target=self.ponder_replies, args=(copy.deepcopy(board),), daemon=True)
+        self.ponder_thread.start()
+
+    def stop_pondering(self):
+        """
+        tells the pondering thread to stop and waits for it to finish
+        :return: void
+        """
+        if self.ponder_thread is not None:
+            self.stop_event.set()
+            self.ponder_thread.join()
+            self.ponder_thread = None
+
+    def ponder_replies(self, board: ChessBoard):
+        """
+        searches the position after each reply of the opponent, results go into the transposition table
+        the reply the last search expected is searched all the way to self.depth first, then every reply is searched
+        one depth at a time so the most likely moves get the most work
+        :param board: chess board with the opponent to move
+        :return: void
+        """
+        replies = self.legal_children(board, Color(1 - self.player_color))
+        entry = self.tt.get(board.hash)
+        if entry is not None:
+            for i in range(len(replies)):
+                if replies[i][0] == entry[3]:
+                    replies.insert(0, replies.pop(i))
+                    break
+
+        # search runs until its depth is reached or stop_event is set, once it is set every later call returns at once
+        if len(replies) > 0:
+            self.search(replies[0][1], self.depth)
+        for depth in range(1, self.depth + 1):
+            for move, child in replies[1:]:
+                if self.stop_event.is_set():
+                    return
+                self.search(child, depth)
+
+    def search(self, board: ChessBoard, max_depth: int, movetime: float = None, info=None) -> list:
+        """
+        searches the board one move deeper at a time until max_depth is reached, time runs out or stop_event is set
+        :param board: chess board, it is not changed by the search
+        :param max_depth: deepest search to run
+        :param movetime: seconds the search is allowed to take or None for no limit
+        :param info: optional function called as info(depth, score, nodes, seconds, move) after each finished depth
+        :return: best move found in the form [r1, c1, r2, c2] or None if there are no legal moves
+        """
+        start = time.time()
+        self.nodes = 0
+        self.best_score = None
+        self.deadline = start + movetime if movetime is not None else None
+        self.earlier_hashes = set(board.history) - {board.hash}
+        self.history_draw = False
+
+        root_moves = self.legal_children(board, self.player_color)
+        if len(root_moves) == 0:
+            return None
+        best_move = root_moves[0][0]
+        best_score = None
+        searched_depth = 0
+
+        # a position that has already been analysed starts from the depth it was analysed to
+        entry = self.tt.get(board.hash)
+        if (entry is None or entry[2] != EXACT) and self.cache is not None:
+            # other processes may have saved this position since the cache was loaded
+            row = self.cache.lookup(board.hash)
+            if row is not None:
+                entry = (row[2], row[1], EXACT, string_to_move(row[0]))
+                self.tt[board.hash] = entry
+        if entry is not None and entry[2] == EXACT:
+            for i in range(len(root_moves)):
+                if root_moves[i][0] == entry[3]:
+                    root_moves.insert(0, root_moves.pop(i))
+                    best_move, best_score, searched_depth = entry[3], entry[1], min(entry[0], max_depth)
+                    if info is not None:
+                        info(searched_depth, best_score, 0, time.time() - start, best_move)
+                    break
+
+        for depth in range(searched_depth + 1, max_depth + 1):
+            if best_score is not None and abs(best_score) >= MATE_SCORE - MAX_DEPTH:
+                break  # no point looking deeper once a mate is found
+            try:
+                score, best_index = self.search_root(root_moves, depth)
+            except SearchStopped:
+                break
+            best_move, best_score, searched_depth = root_moves[best_index][0], score, depth
+            root_moves.insert(0, root_moves.pop(best_index))  # search the best move first next time
+            self.tt[board.hash] = (depth, score, EXACT, best_move)
+            if info is not None:
+                info(depth, score, self.nodes, time.time() - start, best_move)
+
+        # the cache is keyed by position only so a score is not saved if it depended on the moves played before
+        # the root, either through a repetition of an earlier position or through the fifty move rule
+        history_free = not self.history_draw and board.halfmove_clock + searched_depth < 100
+        if self.cache is not None and self.nodes > 0 and best_score is not None and history_free:
+            self.cache.store(board.hash, move_to_string(best_move), best_score, searched_depth, self.nodes)
+        self.best_score = best_score
+        return best_move
+
+    def search_root(self, root_moves: list, depth: int) -> tuple:
+        """
+        runs one alpha beta search of the given depth over the root moves
+        :param root_moves: list of [move, board after move] pairs
+        :param depth: depth of the search
+        :return: tuple of the best score and the index of the best move in root_moves
+        """
+        alpha = -MATE_SCORE - 1
+        best_index = 0
+        for i, (move, child) in enumerate(root_moves):
+            if self.is_search_draw(child):
+                score = 0
+            else:
+                score = -self.alpha_beta(child, Color(1 - self.player_color), depth - 1, -MATE_SCORE - 1, -alpha, 1)
+            if score > alpha:
+                alpha = score
+                best_index = i
+        return alpha, best_index
+
+    def alpha_beta(self, board: ChessBoard, color: Color, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """
+        negamax alpha beta search
+        :param board: chess board
+        :param color: color of the player to move
+        :param depth: how many more moves to look ahead
+        :param alpha: lower bound of the score
+        :param beta: upper bound of the score
+        :param ply: how many moves from the root of the search this position is
+        :return: score of the position for the player to move
+        """
+        if self.stop_event.is_set() or (self.deadline is not None and time.time() > self.deadline):
+            raise SearchStopped()
+        self.nodes += 1
+
+        if depth == 0:
+            return evaluate(board, color)
+
+        # use the transposition table to skip positions that have already been searched deep enough
+        alpha_orig = alpha
+        tt_move = None
+        entry = self.tt.get(board.hash)
+        if entry is not None:
+            tt_move = entry[3]
+            if entry[0] >= depth:
+                score = from_tt(entry[1], ply)
+                if entry[2] == EXACT or (entry[2] == LOWER_BOUND and score >= beta) or \
+                        (entry[2] == UPPER_BOUND and score <= alpha):
+                    return score
+
+        moves = get_all_moves(board, color)
+        # with no legal moves the player is either checkmated or stalemated
+        if len(moves) == 0:
+            return -(MATE_SCORE - ply) if board.is_check(color) else 0
+        if tt_move in moves:  # the best move from last time is tried first
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        best = -MATE_SCORE - 1
+        best_move = None
+        for move in moves:
+            # moves come from the list of legal moves so they are made without being checked again
+            child = copy.deepcopy(board)
+            child.make_move(move[0], move[1], move[2], move[3])
+            # a position seen before in this line is scored as a draw so the search doesn't go round in circles
+            if self.is_search_draw(child):
+                score = 0
+            else:
+                score = -self.alpha_beta(child, Color(1 - color), depth - 1, -beta, -alpha, ply + 1)
+            if score > best:
+                best = score
+                best_move = move
+            if best > alpha:
+                alpha = best
+            if alpha >= beta:
+                break
+
+        if len(self.tt) >= TT_SIZE:
+            self.tt = dict(self.cache_tt)
+        kind = UPPER_BOUND if best <= alpha_orig else LOWER_BOUND if best >= beta else EXACT
+        self.tt[board.hash] = (depth, to_tt(best, ply), kind, best_move)
+        return best
+
+    def is_search_draw(self, board: ChessBoard) -> bool:
+        """
+        checks if a position reached in the search is a draw, noting when it is only a repetition because of a
+        position played before the root
+        :param board: chess board
+        :return: boolean stating whether the position is scored as a draw
+        """
+        if not board.is_draw(2):
+            return False
+        if board.hash in self.earlier_hashes:
+            self.history_draw = True
+        return True
+
+    @staticmethod
+    def legal_children(board: ChessBoard, color: Color) -> list:
+        """
+        creates a list of the legal moves for the color passed in along with the board after each move
+        :param board: chess board
+        :param color: color of player to move
+        :return: list of [move, board after move] pairs
+        """
+        children = []
+        for move in get_all_moves(board, color):
+            child = copy.deepcopy(board)
+            child.make_move(move[0], move[1], move[2], move[3])
+            children.append([move, child])
+        return children
+
+
+# mate scores count moves from the root of the search, in the table they count from the position itself
+
+def to_tt(score: int, ply: int) -> int:
+    if score >= MATE_SCORE - MAX_DEPTH:
+        return score + ply
+    if score <= -(MATE_SCORE - MAX_DEPTH):
+        return score - ply
+    return score
+
+
+def from_tt(score: int, ply: int) -> int:
+    if score >= MATE_SCORE - MAX_DEPTH:
+        return score - ply
+    if score <= -(MATE_SCORE - MAX_DEPTH):
+        return score + ply
+    return score
+
+
+def evaluate(board: ChessBoard, color: Color) -> int:
+    """
+    scores the board from the point of view of the color passed in
+    material counts the most with small bonuses for advanced pawns and centralised pieces
+    :param board: chess board
+    :param color: color of player the score is for
+    :return: score in centipawns, positive if the player is ahead
+    """
+    score = 0
+    for r in range(8):
+        for c in range(8):
+            piece = board.board[r][c]
+            if piece.piece_color == Color.BLANK:
+                continue
+            value = PIECE_VALUES[type(piece)]
+            if isinstance(piece, Pawn):
+                value += 5 * (r - 1 if piece.piece_color == Color.WHITE else 6 - r)
+            elif isinstance(piece, (Knight, Bishop)):
+                value += 10 - 3 * int(max(abs(3.5 - r), abs(3.5 - c)))
+            score += value if piece.piece_color == color else -value
+    return score
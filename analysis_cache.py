@@ -0,0 +1,84 @@
+# This module keeps the results of CPU searches in an SQLite file so they survive between runs
+# many processes can read and write the same file at once, SQLite's write ahead log keeps it consistent
+import sqlite3
+import threading
+
+TABLE = """CREATE TABLE IF NOT EXISTS analysis (
+    hash INTEGER PRIMARY KEY,
+    best_move TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    nodes INTEGER NOT NULL
+)"""
+
+
+# SQLite integers are signed so the 64 bit position hashes are shifted into that range and back
+
+def to_signed(h: int) -> int:
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def to_unsigned(h: int) -> int:
+    return h + (1 << 64) if h < 0 else h
+
+
+class AnalysisCache:
+
+    # constructor
+    def __init__(self, path: str, timeout: float = 30.0):
+        """
+        opens (creating if needed) the analysis file at path
+        :param path: path of the SQLite file
+        :param timeout: seconds to wait for another process to finish writing before giving up
+        """
+        self.path = path
+        self.lock = threading.Lock()  # the connection is shared by the search thread and the main thread
+        self.conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(TABLE)
+            self.conn.commit()
+
+    def lookup(self, h: int) -> tuple:
+        """
+        finds the stored analysis of a position
+        :param h: hash of the position
+        :return: tuple of (best move, score, depth, nodes) or None if the position has not been analysed
+        """
+        with self.lock:
+            return self.conn.execute("SELECT best_move, score, depth, nodes FROM analysis WHERE hash = ?",
+                                     (to_signed(h),)).fetchone()
+
+    def store(self, h: int, best_move: str, score: int, depth: int, nodes: int):
+        """
+        saves the analysis of a position, a deeper analysis already in the file is never replaced by a shallower one
+        :param h: hash of the position
+        :param best_move: best move in coordinate notation
+        :param score: score of the position for the player to move
+        :param depth: depth the position was searched to
+        :param nodes: number of positions the search looked at
+        :return: void
+        """
+        with self.lock:
+            self.conn.execute("INSERT INTO analysis (hash, best_move, score, depth, nodes) VALUES (?, ?, ?, ?, ?) "
+                              "ON CONFLICT (hash) DO UPDATE SET best_move = excluded.best_move, "
+                              "score = excluded.score, depth = excluded.depth, nodes = excluded.nodes "
+                              "WHERE excluded.depth > analysis.depth",
+                              (to_signed(h), best_move, score, depth, nodes))
+            self.conn.commit()
+
+    def entries(self, limit: int = -1) -> list:
+        """
+        reads the stored analyses deepest first, used to fill the CPU's transposition table at startup
+        :param limit: most analyses to read, -1 for all of them
+        :return: list of tuples of (hash, best move, score, depth, nodes)
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT hash, best_move, score, depth, nodes FROM analysis "
+                                     "ORDER BY depth DESC LIMIT ?", (limit,)).fetchall()
+        return [(to_unsigned(row[0]),) + tuple(row[1:]) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -1,5 +1,5 @@
 from Players import Player, HumanPlayer, CPUPlayer
-from ChessBoard import ChessBoard
+from ChessBoard import ChessBoard, MoveType
 from Pieces import Color
 
 
@@ -17,16 +17,18 @@ def main():
             elif num_player == 1:
                 who_first = get_user_response("Do you want to be White(W) or Black(B)?: ", "WB")
                 difficulty = get_user_response("How good do you want the computer to play (1-9): ", "123456789")
+                # the CPU ponders while the human thinks about their move
                 if who_first == 0:
                     p1 = HumanPlayer(Color.WHITE)
-                    p2 = CPUPlayer(Color.BLACK)
+                    p2 = CPUPlayer(Color.BLACK, ponder=True)
                 else:
-                    p1 = CPUPlayer(Color.WHITE)
+                    p1 = CPUPlayer(Color.WHITE, ponder=True)
                     p2 = HumanPlayer(Color.BLACK)
             else:
                 p1 = HumanPlayer(Color.WHITE)
                 p2 = HumanPlayer(Color.BLACK)
         board.init_board()
+        board.init_coord()
         play_game(p1, p2, board)
         pa_resp = get_user_response("Do you want to play again Y/N: ", "YN")
         if pa_resp == 1:  # break if user wanted to quit
@@ -37,7 +39,15 @@ def main():
     del p2
 
 
-def play_game(p1: Player, p2: Player, board: ChessBoard):
+def play_game(p1: Player, p2: Player, board: ChessBoard, writer=None):
+    """
+    plays a game between the two players
+    :param p1: player who moves first
+    :param p2: player who moves second
+    :param board: chess board the game is played on
+    :param writer: optional DatasetWriter that every position of the game is saved to
+    :return: void
+    """
     p1.reset_game()
     p2.reset_game()
     cur_player = 0
@@ -46,13 +56,29 @@ def play_game(p1: Player, p2: Player, board: ChessBoard):
         board.display_board()
         if quit_game:
             break
-        if cur_player == 0:
-            quit_game = p1.move(board)
-        else:
-            quit_game = p2.move(board)
+        player = p1 if cur_player == 0 else p2
+        turn = board.turn
+        position = writer.pack_position(board) if writer is not None else None
+        quit_game = player.move(board)
+        if writer is not None and board.turn != turn:  # only record the position if a move was made
+            writer.add_position(position, board.last_move, player.last_score)
         cur_player = 1 - cur_player  # switch whose turn it is
         print("")
 
+    # the game result is saved with its positions, a game that was quit before the end isn't saved
+    if writer is not None:
+        outcome = board.get_outcome(board.turn)
+        if outcome == MoveType.MOVE_PASSED:
+            writer.discard_game()
+        elif outcome == MoveType.CHECKMATE:
+            writer.end_game(-1 if board.turn == Color.WHITE else 1)
+        else:
+            writer.end_game(0)
+    # stop any CPU that is still pondering now that the game is over
+    for player in (p1, p2):
+        if isinstance(player, CPUPlayer):
+            player.stop_pondering()
+
 
 def get_user_response(question: str, acc_resp: str) -> int:
     while True:
@@ -65,4 +91,5 @@ def get_user_response(question: str, acc_resp: str) -> int:
 
 
 # This is the code to be run
-main()
+if __name__ == "__main__":
+    main()
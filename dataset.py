@@ -0,0 +1,217 @@
+# This module saves positions from played games as packed binary records for training and tuning
+# records are written to .npy shards that numpy can memory map, so huge datasets are read without loading them
+# play self-play games into a dataset with: python dataset.py --games 100 --depth 2 --out data
+#
+# reading a dataset back:
+#   reader = DatasetReader("data")
+#   for batch in reader.batches(4096):
+#       boards = unpack_boards(batch["board"])  # (n, 64) array of piece codes
+#       from_squares, to_squares = unpack_moves(batch["move"])
+from ChessBoard import ChessBoard
+from Players import CPUPlayer
+from Pieces import Color, Pawn, Knight, Bishop, Rook, Queen, King
+import argparse
+import contextlib
+import glob
+import numpy
+import os
+
+# each square is a 4 bit code, 0 is an empty square and black pieces have 8 added to the white code
+PIECE_CODES = {Pawn: 1, Knight: 2, Bishop: 3, Rook: 4, Queen: 5, King: 6}
+BLACK_CODE = 8
+
+# 39 bytes per position
+RECORD_DTYPE = numpy.dtype([
+    ("board", numpy.uint8, (32,)),  # 64 squares, 2 per byte, square 8 * row + col, even squares in the low 4 bits
+    ("side", numpy.uint8),  # color to move, 0 white 1 black
+    ("castling", numpy.uint8),  # bits for white queen side, white king side, black queen side, black king side
+    ("move", numpy.uint16),  # move played as 64 * from square + to square
+    ("score", numpy.int16),  # search score of the move for the side to move in centipawns, SCORE_NONE if unknown
+    ("result", numpy.int8),  # result of the game, 1 white won, 0 draw, -1 black won
+])
+SCORE_NONE = -32768
+SCORE_LIMIT = 32000  # mate scores are clamped to this to fit in 16 bits
+
+SHARD_PATTERN = "shard-{:06d}.npy"
+
+
+class DatasetWriter:
+
+    # constructor
+    def __init__(self, directory: str, shard_size: int = 1 << 20):
+        """
+        :param directory: directory the shards are written to, numbering carries on after any shards already there
+        :param shard_size: number of positions in each shard
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.shard_number = len(glob.glob(os.path.join(directory, "shard-*.npy")))
+        self.buffer = numpy.zeros(shard_size, dtype=RECORD_DTYPE)  # positions waiting to be written
+        self.count = 0  # number of positions in buffer
+        self.game = []  # positions of the game being played, saved once its result is known
+
+    @staticmethod
+    def pack_position(board: ChessBoard) -> numpy.ndarray:
+        """
+        packs the board into a record, the move, score and result are filled in later
+        :param board: chess board
+        :return: record of the position
+        """
+        codes = numpy.zeros(64, dtype=numpy.uint8)
+        for r in range(8):
+            for c in range(8):
+                piece = board.board[r][c]
+                if piece.piece_color == Color.WHITE:
+                    codes[8 * r + c] = PIECE_CODES[type(piece)]
+                elif piece.piece_color == Color.BLACK:
+                    codes[8 * r + c] = PIECE_CODES[type(piece)] + BLACK_CODE
+        record = numpy.zeros((), dtype=RECORD_DTYPE)
+        record["board"] = codes[0::2] | (codes[1::2] << 4)
+        record["side"] = int(board.turn)
+        record["castling"] = sum(1 << i for i, right in enumerate(board.castling_rights()) if right)
+        return record
+
+    def add_position(self, record: numpy.ndarray, move: list, score: int = None):
+        """
+        adds a position of the current game along with the move played from it
+        :param record: position packed by pack_position before the move was made
+        :param move: move played in the form [r1, c1, r2, c2]
+        :param score: search score of the move or None if it wasn't searched
+        :return: void
+        """
+        record["move"] = 64 * (8 * move[0] + move[1]) + 8 * move[2] + move[3]
+        record["score"] = SCORE_NONE if score is None else max(-SCORE_LIMIT, min(SCORE_LIMIT, score))
+        self.game.append(record)
+
+    def end_game(self, result: int):
+        """
+        saves the positions of the current game with its result
+        :param result: 1 if white won, 0 for a draw, -1 if black won
+        :return: void
+        """
+        for record in self.game:
+            record["result"] = result
+            self.buffer[self.count] = record
+            self.count += 1
+            if self.count == self.shard_size:
+                self.flush()
+        self.game = []
+
+    def discard_game(self):
+        self.game = []
+
+    def flush(self):
+        """
+        writes the buffered positions to a new shard
+        the shard is written under a temporary name so readers never see a partly written file, then linked to the
+        first free shard name, linking fails if the name is taken so writers sharing a directory never overwrite
+        each other's shards
+        :return: void
+        """
+        if self.count == 0:
+            return
+        tmp_path = os.path.join(self.directory, "shard.{}.tmp".format(os.getpid()))
+        with open(tmp_path, "wb") as f:
+            numpy.save(f, self.buffer[:self.count])
+        while True:
+            try:
+                os.link(tmp_path, os.path.join(self.directory, SHARD_PATTERN.format(self.shard_number)))
+                break
+            except FileExistsError:
+                self.shard_number += 1
+        os.remove(tmp_path)
+        self.shard_number += 1
+        self.count = 0
+
+    def close(self):
+        self.flush()
+
+
+class DatasetReader:
+
+    # constructor
+    def __init__(self, directory: str):
+        self.paths = sorted(glob.glob(os.path.join(directory, "shard-*.npy")))
+
+    def shards(self):
+        """
+        memory maps each shard in turn so only the parts that are used get read from disk
+        :return: generator of record arrays
+        """
+        for path in self.paths:
+            yield numpy.load(path, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards())
+
+    def batches(self, batch_size: int):
+        """
+        reads the dataset in batches, batches are views of the shards except where one crosses into the next shard
+        :param batch_size: number of positions in each batch, the last batch may be smaller
+        :return: generator of record arrays
+        """
+        leftover = None
+        for shard in self.shards():
+            start = 0
+            if leftover is not None:
+                start = batch_size - len(leftover)
+                batch = numpy.concatenate([leftover, shard[:start]])
+                if len(batch) < batch_size:
+                    leftover = batch
+                    continue
+                leftover = None
+                yield batch
+            while start + batch_size <= len(shard):
+                yield shard[start:start + batch_size]
+                start += batch_size
+            if start < len(shard):
+                leftover = numpy.array(shard[start:])
+        if leftover is not None and len(leftover) > 0:
+            yield leftover
+
+
+def unpack_boards(boards: numpy.ndarray) -> numpy.ndarray:
+    """
+    unpacks the board field of a batch into one piece code per square
+    :param boards: (n, 32) array of packed boards
+    :return: (n, 64) array of piece codes indexed by square 8 * row + col
+    """
+    codes = numpy.empty((len(boards), 64), dtype=numpy.uint8)
+    codes[:, 0::2] = boards & 0x0F
+    codes[:, 1::2] = boards >> 4
+    return codes
+
+
+def unpack_moves(moves: numpy.ndarray) -> tuple:
+    """
+    splits the move field of a batch into its start and destination squares
+    :param moves: array of packed moves
+    :return: tuple of (from squares, to squares) arrays
+    """
+    return moves // 64, moves % 64
+
+
+def main():
+    from chess import play_game  # chess.py is the game's main module so it is only loaded when playing games
+
+    parser = argparse.ArgumentParser(description="Play CPU against CPU games and save their positions")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=2, help="search depth of both CPUs")
+    parser.add_argument("--out", default="data", help="directory the shards are written to")
+    parser.add_argument("--shard-size", type=int, default=1 << 20, help="positions in each shard")
+    args = parser.parse_args()
+
+    writer = DatasetWriter(args.out, args.shard_size)
+    for i in range(args.games):
+        # the board and moves printed during the game aren't needed here
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            play_game(CPUPlayer(Color.WHITE, args.depth), CPUPlayer(Color.BLACK, args.depth), ChessBoard(), writer)
+        print("Game {} of {} done".format(i + 1, args.games))
+    writer.close()
+    print("{} positions in {}".format(len(DatasetReader(args.out)), args.out))
+
+
+# This is the code to be run
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# This module is a load test client for server.py
+# it plays many games at once with random legal moves and reports moves per second and move latency
+# run it with: python loadtest.py --games 1000 --connections 10 --moves 20
+import argparse
+import asyncio
+import random
+import time
+
+
+class GameClient:
+
+    # constructor
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.waiting = {}  # maps game id to the future waiting on that game's reply
+
+    async def read_replies(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            tokens = line.decode().split()
+            future = self.waiting.pop(tokens[0], None)
+            if future is not None and not future.done():
+                future.set_result(tokens[1:])
+
+    async def send(self, game_id: str, command: str) -> list:
+        """
+        sends a command for one game and waits for the server's reply to it
+        :param game_id: id of the game
+        :param command: command without the game id
+        :return: tokens of the reply without the game id
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[game_id] = future
+        self.writer.write("{} {}\n".format(game_id, command).encode())
+        await self.writer.drain()
+        return await future
+
+
+async def play(client: GameClient, game_id: str, max_moves: int, depth: int, latencies: list):
+    """
+    plays one game as white with random legal moves
+    :param client: connection the game is played over
+    :param game_id: id of the game
+    :param max_moves: number of moves the human makes before the game is ended
+    :param depth: search depth of the CPU
+    :param latencies: list the time taken by each move is added to
+    :return: void
+    """
+    await client.send(game_id, "new white {}".format(depth))
+    for i in range(max_moves):
+        legal = await client.send(game_id, "legal")
+        if legal[0] != "legal" or len(legal) == 1:
+            break
+        start = time.perf_counter()
+        reply = await client.send(game_id, "move {}".format(random.choice(legal[1:])))
+        latencies.append(time.perf_counter() - start)
+        if reply[0] != "ok":
+            break
+    await client.send(game_id, "end")
+
+
+async def run(host: str, port: int, games: int, connections: int, max_moves: int, depth: int):
+    clients = []
+    for i in range(connections):
+        reader, writer = await asyncio.open_connection(host, port)
+        clients.append(GameClient(reader, writer))
+    readers = [asyncio.ensure_future(client.read_replies()) for client in clients]
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[play(clients[i % connections], "g{}".format(i), max_moves, depth, latencies)
+                           for i in range(games)])
+    elapsed = time.perf_counter() - start
+
+    for client in clients:
+        client.writer.close()
+    for task in readers:
+        task.cancel()
+
+    latencies.sort()
+    if len(latencies) == 0:
+        print("No moves were made")
+        return
+    # every move sent by the client is answered by a CPU move so each latency covers two moves
+    print("games: {}  moves: {}  time: {:.2f}s".format(games, 2 * len(latencies), elapsed))
+    print("moves per second: {:.1f}".format(2 * len(latencies) / elapsed))
+    print("move latency  p50: {:.1f}ms  p99: {:.1f}ms  max: {:.1f}ms".format(
+        1000 * latencies[len(latencies) // 2], 1000 * latencies[int(len(latencies) * 0.99)],
+        1000 * latencies[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chess game server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--games", type=int, default=100, help="number of games played at the same time")
+    parser.add_argument("--connections", type=int, default=10, help="number of connections the games share")
+    parser.add_argument("--moves", type=int, default=10, help="moves the client makes in each game")
+    parser.add_argument("--depth", type=int, default=1, help="search depth of the CPU")
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.games, args.connections, args.moves, args.depth))
+
+
+# This is the code to be run
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# This module runs a server that hosts many chess games at once over a simple line protocol
+# run it with: python server.py --port 8765 --workers 4 --max-depth 4 --movetime 5
+#
+# every command and reply starts with a game id chosen by the client so one connection can play many games
+#   <id> new <white|black> [depth]   start a game, the human plays the color given, depth is capped by --max-depth
+#   <id> move e2e4                   make a move for the human, the CPU replies in the same line
+#   <id> legal                       list the human's legal moves
+#   <id> end                         forget the game
+# replies
+#   <id> ok [cpu move]               move was made and the game goes on
+#   <id> gameover <reason> [cpu move]
+#   <id> illegal
+#   <id> legal <moves...>
+#   <id> error <message>
+from ChessBoard import ChessBoard, MoveType, PROMOTION_PIECES, move_to_string, string_to_move
+from Players import CPUPlayer
+from Pieces import Color, Pawn, Queen
+from analysis_cache import AnalysisCache
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import re
+
+# a promotion letter is only allowed on a move from the 7th to the 8th row or the 2nd to the 1st row
+MOVE_PATTERN = re.compile("^([a-h][1-8]){2}$|^[a-h]7[a-h]8[qrbn]$|^[a-h]2[a-h]1[qrbn]$")
+
+
+class GameSession:
+
+    # constructor
+    def __init__(self, human_color: Color, depth: int):
+        self.board = ChessBoard()
+        self.human_color = human_color
+        self.cpu_color = Color(1 - human_color)
+        self.depth = depth
+        self.lock = asyncio.Lock()  # only one command per game is worked on at a time
+        self.over = False
+
+
+# The functions below are run in the worker processes so they must be importable at module level
+
+# each worker process keeps one CPU player so its transposition table lasts from one move to the next
+worker_player = None
+
+
+def init_worker(cache_path: str):
+    """
+    sets up the CPU player of a worker process, loading saved analysis if a cache file was given
+    :param cache_path: path of the analysis cache file or None
+    :return: void
+    """
+    global worker_player
+    worker_player = CPUPlayer(Color.WHITE, cache=AnalysisCache(cache_path) if cache_path is not None else None)
+
+
+def cpu_move(board: ChessBoard, color: Color, depth: int, movetime: float) -> list:
+    """
+    searches for the CPU's move in a worker process
+    :param board: chess board
+    :param color: color of the CPU
+    :param depth: depth of the search
+    :param movetime: seconds the search is allowed to take or None for no limit
+    :return: best move in the form [r1, c1, r2, c2] or None if the CPU has no legal moves
+    """
+    if worker_player is None:
+        init_worker(None)
+    worker_player.player_color = color
+    return worker_player.search(board, depth, movetime)
+
+
+class GameServer:
+
+    # constructor
+    def __init__(self, pool: ProcessPoolExecutor, default_depth: int = 2, max_depth: int = 4, movetime: float = None):
+        self.pool = pool
+        self.default_depth = default_depth
+        # a deep search holds up a worker process that every other game shares, so clients can't ask for one
+        self.max_depth = max_depth
+        self.movetime = movetime  # seconds a CPU move may take or None for no limit
+        self.sessions = {}  # maps (connection, game id) to GameSession
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        conn = id(writer)
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                # every command gets its own task so a slow CPU move doesn't hold up the other games
+                task = asyncio.ensure_future(self.handle_command(conn, line.decode().split(), writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for key in [key for key in self.sessions if key[0] == conn]:
+                del self.sessions[key]
+            writer.close()
+
+    async def handle_command(self, conn: int, tokens: list, writer: asyncio.StreamWriter):
+        if len(tokens) < 2:
+            return
+        game_id, cmd, args = tokens[0], tokens[1], tokens[2:]
+        try:
+            reply = await self.run_command(conn, game_id, cmd, args)
+        except Exception as e:
+            reply = "error {}".format(e)
+        writer.write("{} {}\n".format(game_id, reply).encode())
+        await writer.drain()
+
+    async def run_command(self, conn: int, game_id: str, cmd: str, args: list) -> str:
+        key = (conn, game_id)
+        if cmd == "new":
+            human_color = Color.BLACK if len(args) > 0 and args[0] == "black" else Color.WHITE
+            depth = max(1, min(int(args[1]), self.max_depth)) if len(args) > 1 else self.default_depth
+            session = GameSession(human_color, depth)
+            self.sessions[key] = session
+            async with session.lock:
+                if human_color == Color.BLACK:
+                    return await self.cpu_turn(session)
+            return "ok"
+
+        session = self.sessions.get(key)
+        if session is None:
+            return "error no game {}".format(game_id)
+
+        if cmd == "end":
+            del self.sessions[key]
+            return "ok"
+        async with session.lock:
+            if session.over:
+                return "gameover finished"
+            if cmd == "legal":
+                moves = session.board.legal_moves(session.human_color)
+                return "legal {}".format(" ".join(move_to_string(move) for move in moves))
+            if cmd == "move":
+                return await self.human_turn(session, args[0] if len(args) > 0 else "")
+        return "error unknown command {}".format(cmd)
+
+    async def human_turn(self, session: GameSession, move_string: str) -> str:
+        """
+        checks and makes the human's move then asks the process pool for the CPU's reply
+        :param session: game being played
+        :param move_string: human's move in coordinate notation
+        :return: reply to send to the client
+        """
+        # if the CPU's last turn failed it is still the CPU to move, the human can't move twice in a row
+        if session.board.turn != session.human_color or not MOVE_PATTERN.match(move_string):
+            return "illegal"
+        r1, c1, r2, c2 = string_to_move(move_string)
+        if not session.board.is_valid_move(r1, c1, r2, c2, session.human_color):
+            return "illegal"
+        promotion = Queen
+        if len(move_string) == 5:
+            # only a pawn reaching the last row can be promoted
+            if not isinstance(session.board.board[r1][c1], Pawn) or r2 not in (0, 7):
+                return "illegal"
+            promotion = PROMOTION_PIECES[move_string[4]]
+        move_type = session.board.move_piece(r1, c1, r2, c2, promotion=promotion)
+        if move_type == MoveType.MOVE_FAILED:
+            return "illegal"
+        if move_type != MoveType.MOVE_PASSED:
+            session.over = True
+            return "gameover {}".format(move_type.name.lower())
+        return await self.cpu_turn(session)
+
+    async def cpu_turn(self, session: GameSession) -> str:
+        """
+        has a worker process search for the CPU's move so the event loop is never blocked by the search
+        :param session: game being played
+        :return: reply to send to the client
+        """
+        best_move = await asyncio.get_running_loop().run_in_executor(
+            self.pool, cpu_move, session.board, session.cpu_color, session.depth, self.movetime)
+        if best_move is None:
+            session.over = True
+            return "gameover nomoves"
+        move_type = session.board.move_piece(best_move[0], best_move[1], best_move[2], best_move[3])
+        if move_type != MoveType.MOVE_PASSED:
+            session.over = True
+            return "gameover {} {}".format(move_type.name.lower(), move_to_string(best_move))
+        return "ok {}".format(move_to_string(best_move))
+
+
+async def serve(host: str, port: int, workers: int, depth: int, max_depth: int, movetime: float, cache_path: str):
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cache_path,)) as pool:
+        game_server = GameServer(pool, min(depth, max_depth), max_depth, movetime)
+        server = await asyncio.start_server(game_server.handle_connection, host, port)
+        print("Serving games on {}:{}".format(host, port))
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many chess games against the CPU")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes searching CPU moves")
+    parser.add_argument("--depth", type=int, default=2, help="default search depth of the CPU")
+    parser.add_argument("--max-depth", type=int, default=4, help="deepest search a client can ask for")
+    parser.add_argument("--movetime", type=float, default=10.0, help="seconds the CPU may take for a move")
+    parser.add_argument("--cache", default=None, help="SQLite file the CPU's analysis is saved to and loaded from")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.depth, args.max_depth, args.movetime, args.cache))
+    except KeyboardInterrupt:
+        pass
+
+
+# This is the code to be run
+if __name__ == "__main__":
+    main()
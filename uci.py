@@ -0,0 +1,201 @@
+# This module lets the CPU player be run by any program that speaks the UCI protocol (match runners, GUIs)
+# run it with: python uci.py
+from ChessBoard import ChessBoard, START_FEN, PROMOTION_PIECES, move_to_string, piece_key, string_to_move
+from Players import CPUPlayer, MATE_SCORE, MAX_DEPTH
+from analysis_cache import AnalysisCache
+from Pieces import Color, Blank, Pawn, Queen
+import copy
+import sys
+import threading
+
+# time held back on every move so the engine never loses on time because of protocol overhead
+MOVE_OVERHEAD = 0.05
+
+
+class UCIEngine:
+
+    # constructor
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.out_lock = threading.Lock()  # search thread and command loop both write to out
+        self.board = ChessBoard()
+        self.cpu = CPUPlayer(Color.WHITE, MAX_DEPTH)
+        self.search_thread = None
+
+    def send(self, line: str):
+        with self.out_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def handle(self, line: str) -> bool:
+        """
+        handles one command sent by the GUI
+        :param line: line of text read from the GUI
+        :return: False once the GUI has sent quit, True otherwise
+        """
+        tokens = line.split()
+        if len(tokens) == 0:
+            return True
+        cmd = tokens[0]
+
+        if cmd == "uci":
+            self.send("id name Senior Project")
+            self.send("id author Senior Project")
+            self.send("option name AnalysisCache type string default <empty>")
+            self.send("uciok")
+        elif cmd == "isready":
+            self.send("readyok")
+        elif cmd == "setoption":
+            self.stop()
+            self.set_option(tokens[1:])
+        elif cmd == "ucinewgame":
+            self.stop()
+            self.board = ChessBoard()
+        elif cmd == "position":
+            self.stop()
+            self.set_position(tokens[1:])
+        elif cmd == "go":
+            self.stop()
+            self.go(tokens[1:])
+        elif cmd == "stop":
+            self.stop()
+        elif cmd == "quit":
+            self.stop()
+            if self.cpu.cache is not None:
+                self.cpu.cache.close()
+            return False
+        return True
+
+    def set_option(self, tokens: list):
+        """
+        handles a setoption command, the only option is AnalysisCache which is the path of the file that search
+        results are saved to and loaded from
+        :param tokens: arguments after the word setoption in the form name <name> value <value>
+        :return: void
+        """
+        if "name" not in tokens or "value" not in tokens:
+            return
+        name = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")])
+        value = " ".join(tokens[tokens.index("value") + 1:])
+        if name == "AnalysisCache":
+            if self.cpu.cache is not None:
+                self.cpu.cache.close()
+                self.cpu.cache = None
+            if value != "" and value != "<empty>":
+                self.cpu.cache = AnalysisCache(value)
+                self.cpu.load_cache()
+
+    def set_position(self, tokens: list):
+        """
+        sets up the board from the arguments of a position command
+        :param tokens: arguments after the word position, startpos or fen followed by an optional list of moves
+        :return: void
+        """
+        if "moves" in tokens:
+            moves = tokens[tokens.index("moves") + 1:]
+            tokens = tokens[:tokens.index("moves")]
+        else:
+            moves = []
+        fen = START_FEN if tokens[0] == "startpos" else " ".join(tokens[1:])
+
+        self.board = ChessBoard()
+        self.board.load_fen(fen)
+        for move_string in moves:
+            apply_move(self.board, move_string)
+
+    def go(self, tokens: list):
+        """
+        starts searching the current position on a background thread
+        the thread sends bestmove when it is done so the command loop stays free to answer stop and isready
+        :param tokens: arguments after the word go
+        :return: void
+        """
+        params = {}
+        for i in range(len(tokens) - 1):
+            if tokens[i] in ("wtime", "btime", "winc", "binc", "movestogo", "movetime", "depth"):
+                params[tokens[i]] = int(tokens[i + 1])
+        infinite = "infinite" in tokens
+
+        depth = params.get("depth", MAX_DEPTH)
+        movetime = None
+        if "movetime" in params:
+            movetime = max(params["movetime"] / 1000 - MOVE_OVERHEAD, 0.01)
+        elif not infinite:
+            time_left = params.get("wtime" if self.board.turn == Color.WHITE else "btime")
+            if time_left is not None:
+                inc = params.get("winc" if self.board.turn == Color.WHITE else "binc", 0)
+                moves_to_go = params.get("movestogo", 30)
+                movetime = min(time_left / moves_to_go + inc, time_left * 0.8) / 1000 - MOVE_OVERHEAD
+                movetime = max(movetime, 0.01)
+
+        self.cpu.player_color = self.board.turn
+        self.cpu.stop_event.clear()
+        self.search_thread = threading.Thread(target=self.run_search,
+                                              args=(copy.deepcopy(self.board), depth, movetime, infinite),
+                                              daemon=True)
+        self.search_thread.start()
+
+    def run_search(self, board: ChessBoard, depth: int, movetime: float, infinite: bool):
+        best_move = self.cpu.search(board, depth, movetime, self.send_info)
+        # in infinite mode bestmove can only be sent after the GUI says stop
+        if infinite:
+            self.cpu.stop_event.wait()
+        self.send("bestmove {}".format(move_to_string(best_move) if best_move is not None else "0000"))
+
+    def send_info(self, depth: int, score: int, nodes: int, seconds: float, move: list):
+        if abs(score) >= MATE_SCORE - MAX_DEPTH:
+            mate_in = (MATE_SCORE - abs(score) + 1) // 2
+            score_string = "mate {}".format(mate_in if score > 0 else -mate_in)
+        else:
+            score_string = "cp {}".format(score)
+        nps = int(nodes / seconds) if seconds > 0 else 0
+        self.send("info depth {} score {} nodes {} nps {} time {} pv {}".format(
+            depth, score_string, nodes, nps, int(seconds * 1000), move_to_string(move)))
+
+    def stop(self):
+        """
+        tells any running search to stop and waits for it to send its bestmove
+        :return: void
+        """
+        if self.search_thread is not None:
+            self.cpu.stop_event.set()
+            self.search_thread.join()
+            self.search_thread = None
+
+
+def apply_move(board: ChessBoard, move_string: str):
+    """
+    makes a move sent by the GUI on the board
+    the GUI has already checked the move so it is made without being checked again, en passant and under
+    promotion are handled here
+    :param board: chess board
+    :param move_string: move in coordinate notation such as e2e4 or e7e8n
+    :return: void
+    """
+    r1, c1, r2, c2 = string_to_move(move_string)
+    piece = board.board[r1][c1]
+
+    # en passant: the captured pawn is beside the moving pawn instead of on the destination square
+    en_passant = isinstance(piece, Pawn) and c1 != c2 and isinstance(board.board[r2][c2], Blank)
+    if en_passant:
+        captured = board.board[r1][c2]
+        board.hash ^= piece_key(captured, r1, c2)
+        board.coord[captured.piece_color][captured.number] = [-1, -1]
+        board.board[r1][c2] = Blank()
+
+    board.make_move(r1, c1, r2, c2, PROMOTION_PIECES[move_string[4]] if len(move_string) == 5 else Queen)
+    # make_move doesn't know about the pawn taken above, the analysis cache is keyed by the hash so it must be right
+    if en_passant:
+        assert board.hash == board.compute_hash(), "hash is wrong after en passant {}".format(move_string)
+
+
+def main():
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+
+
+# This is the code to be run
+if __name__ == "__main__":
+    main()